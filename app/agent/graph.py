@@ -11,11 +11,23 @@ from app.agent.nodes import (
 )
 
 
+def content_to_text(raw) -> str:
+    """Flatten message content (a string or a list of content parts) into plain text."""
+    if isinstance(raw, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in raw
+        )
+    return str(raw)
+
+
 def route_to_agent(state: AgentState) -> str:
     return state["next_agent"]
 
 
-def build_graph():
+def build_graph(checkpointer: bool = True):
+    """Compile the agent graph. Pass checkpointer=False for one-shot runs (e.g. batch jobs)
+    that need no conversation memory, so finished runs leave no state behind."""
     graph = StateGraph(AgentState)
 
     graph.add_node("supervisor", supervisor_node)
@@ -42,5 +54,7 @@ def build_graph():
     graph.add_edge("comparison_agent", END)
     graph.add_edge("guardrail", END)
 
+    if not checkpointer:
+        return graph.compile()
     memory = MemorySaver()
     return graph.compile(checkpointer=memory)
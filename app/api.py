@@ -1,6 +1,7 @@
 import uuid
 import json
 import asyncio
+from collections import deque
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -8,6 +9,7 @@ load_dotenv()
 
 from fastapi import FastAPI, File, UploadFile, BackgroundTasks, HTTPException, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage, AIMessageChunk
 
 from app.data.ingest import (
@@ -15,7 +17,9 @@ from app.data.ingest import (
     UPLOADS_DIR,
     ingest_single_pdf,
 )
-from app.agent.graph import build_graph
+from app.agent.graph import build_graph, content_to_text
+from app.concurrency import admission, TokenStreamer, SlowClientError, MAX_CONCURRENT_RUNS
+from app.batch import BATCH_CONCURRENCY, load_questions, run_batch
 
 
 app = FastAPI(title="PolicyPilot API", version="0.1.0")
@@ -29,6 +33,8 @@ app.add_middleware(
 )
 
 graph = build_graph()
+# Batch questions are independent one-shot runs; without a checkpointer they leave nothing in memory.
+batch_graph = build_graph(checkpointer=False)
 
 
 # ── Upload endpoints ──
@@ -79,17 +85,153 @@ async def upload_pdf(
     }
 
 
+# ── Batch question answering ──
+
+@app.post("/api/batch")
+async def batch_questions(
+    file: UploadFile = File(...),
+    concurrency: int = Form(BATCH_CONCURRENCY),
+    user_id: str = Form("batch"),
+):
+    content = await file.read()
+    try:
+        questions = load_questions(content.decode("utf-8").splitlines())
+    except UnicodeDecodeError:
+        raise HTTPException(400, "File must be UTF-8 encoded JSONL")
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not questions:
+        raise HTTPException(400, "No questions found in file")
+
+    # Batch runs share the server-wide admission limit with chat sessions.
+    concurrency = max(1, min(concurrency, MAX_CONCURRENT_RUNS))
+
+    async def results():
+        async for result in run_batch(
+            batch_graph,
+            questions,
+            concurrency=concurrency,
+            # At most `concurrency` batch tickets wait at once, so they skip the chat queue cap
+            # and wait for admission instead of failing when chat traffic fills the queue.
+            slot=lambda: admission.slot(user_id, per_user_limit=concurrency, queue_limited=False),
+        ):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 # ── WebSocket chat with streaming ──
 
+async def _stream_answer(ws: WebSocket, user_text: str, config: dict) -> None:
+    streamer = TokenStreamer(ws)
+    try:
+        final_answer = ""
+        async for event in graph.astream_events(
+            {"messages": [HumanMessage(content=user_text)]},
+            config=config,
+            version="v2",
+        ):
+            kind = event.get("event")
+            if kind == "on_chat_model_stream":
+                node = event.get("metadata", {}).get("langgraph_node", "")
+                if node == "supervisor":
+                    continue
+                chunk = event.get("data", {}).get("chunk")
+                if chunk and hasattr(chunk, "content") and chunk.content:
+                    token = content_to_text(chunk.content)
+                    if token:
+                        final_answer += token
+                        await streamer.push(token)
+
+        if not final_answer:
+            state = graph.get_state(config)
+            msgs = state.values.get("messages", [])
+            if msgs:
+                raw = msgs[-1].content if hasattr(msgs[-1], "content") else str(msgs[-1])
+                final_answer = content_to_text(raw)
+            if not final_answer:
+                final_answer = "I couldn't generate a response. Please try again."
+            await streamer.push(final_answer)
+
+        await streamer.close()
+    except BaseException:
+        await streamer.abort()
+        raise
+
+
+# Messages a client may send ahead while its current one is queued or running; the ASGI
+# receive queue no longer applies backpressure once we read the socket while queued.
+MAX_PENDING_MESSAGES = 1
+
+
+async def _acquire_while_connected(
+    ws: WebSocket,
+    user_id: str,
+    on_queued,
+    inbox: deque[str],
+) -> bool:
+    """Wait for an admission slot while watching the socket for a disconnect.
+
+    Nothing else reads the socket while a client is queued, so without this a client
+    that leaves keeps its ticket until a send to it fails. Messages that arrive in the
+    meantime are kept in inbox, up to MAX_PENDING_MESSAGES; extra ones are rejected with
+    an error frame. Returns False (holding no slot) if the client left.
+    """
+    acquire = asyncio.ensure_future(admission.acquire(user_id, on_queued=on_queued))
+    receive = asyncio.ensure_future(ws.receive())
+    granted = False
+    try:
+        while True:
+            await asyncio.wait({acquire, receive}, return_when=asyncio.FIRST_COMPLETED)
+            if receive.done():
+                message = receive.result()
+                if message["type"] == "websocket.disconnect":
+                    return False
+                if message.get("text") is not None:
+                    if len(inbox) < MAX_PENDING_MESSAGES:
+                        inbox.append(message["text"])
+                    else:
+                        await ws.send_text(json.dumps({
+                            "type": "error",
+                            "content": "Still working on your previous message; please wait for it to finish.",
+                        }))
+                if not acquire.done():
+                    receive = asyncio.ensure_future(ws.receive())
+                    continue
+            if acquire.done():
+                acquire.result()
+                granted = True
+                return True
+    finally:
+        if not receive.done():
+            receive.cancel()
+        if not granted:
+            # acquire() gives its slot back if cancelled after the grant, but a wait that
+            # already finished holds a slot nobody else will release.
+            acquire.cancel()
+            await asyncio.gather(acquire, return_exceptions=True)
+            if not acquire.cancelled() and acquire.exception() is None:
+                admission.release(user_id)
+        await asyncio.gather(receive, return_exceptions=True)
+
+
 @app.websocket("/ws/chat")
 async def chat_ws(ws: WebSocket):
     await ws.accept()
     thread_id = str(uuid.uuid4())
     config = {"configurable": {"thread_id": thread_id}}
+    # Without ?user_id= the key is the connection, which already runs one question at a time,
+    # so only the global limit applies. The id is client-chosen and trusted as-is: it groups
+    # cooperating clients under MAX_RUNS_PER_USER but is not an abuse control.
+    user_id = ws.query_params.get("user_id") or thread_id
+    inbox: deque[str] = deque()
+
+    async def report_position(position: int) -> None:
+        await ws.send_text(json.dumps({"type": "queued", "position": position}))
 
     try:
         while True:
-            data = await ws.receive_text()
+            data = inbox.popleft() if inbox else await ws.receive_text()
             try:
                 payload = json.loads(data)
             except json.JSONDecodeError:
@@ -99,52 +241,21 @@ async def chat_ws(ws: WebSocket):
             if not user_text:
                 continue
 
-            await ws.send_text(json.dumps({"type": "start"}))
-
             try:
-                final_answer = ""
-                async for event in graph.astream_events(
-                    {"messages": [HumanMessage(content=user_text)]},
-                    config=config,
-                    version="v2",
-                ):
-                    kind = event.get("event")
-                    if kind == "on_chat_model_stream":
-                        node = event.get("metadata", {}).get("langgraph_node", "")
-                        if node == "supervisor":
-                            continue
-                        chunk = event.get("data", {}).get("chunk")
-                        if chunk and hasattr(chunk, "content") and chunk.content:
-                            raw = chunk.content
-                            if isinstance(raw, list):
-                                token = "".join(
-                                    part.get("text", "") if isinstance(part, dict) else str(part)
-                                    for part in raw
-                                )
-                            else:
-                                token = str(raw)
-                            if token:
-                                final_answer += token
-                                await ws.send_text(json.dumps({"type": "token", "content": token}))
-
-                if not final_answer:
-                    state = graph.get_state(config)
-                    msgs = state.values.get("messages", [])
-                    if msgs:
-                        raw = msgs[-1].content if hasattr(msgs[-1], "content") else str(msgs[-1])
-                        if isinstance(raw, list):
-                            final_answer = "".join(
-                                part.get("text", "") if isinstance(part, dict) else str(part)
-                                for part in raw
-                            )
-                        else:
-                            final_answer = str(raw)
-                    if not final_answer:
-                        final_answer = "I couldn't generate a response. Please try again."
-                    await ws.send_text(json.dumps({"type": "token", "content": final_answer}))
-
+                if not await _acquire_while_connected(ws, user_id, report_position, inbox):
+                    return
+                try:
+                    await ws.send_text(json.dumps({"type": "start"}))
+                    await _stream_answer(ws, user_text, config)
+                finally:
+                    admission.release(user_id)
                 await ws.send_text(json.dumps({"type": "end"}))
 
+            except SlowClientError:
+                await ws.close(code=1013, reason="Client too slow")
+                return
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 await ws.send_text(json.dumps({"type": "error", "content": str(e)}))
 
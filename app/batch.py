@@ -0,0 +1,134 @@
+import os
+import json
+import asyncio
+from typing import AsyncContextManager, AsyncIterator, Callable, Iterable
+from typing_extensions import TypedDict
+
+from langchain_core.messages import HumanMessage
+
+from app.agent.graph import content_to_text
+from app.data.ingest import PDF_CATEGORIES
+from app.tools.policy_tools import RetrievalCache, batch_retrieval_cache
+
+BATCH_CONCURRENCY = int(os.getenv("POLICYPILOT_BATCH_CONCURRENCY", "4"))
+
+
+class BatchQuestion(TypedDict):
+    id: str
+    question: str
+    category: str | None
+
+
+def load_questions(lines: Iterable[str]) -> list[BatchQuestion]:
+    """Parse JSONL questions.
+
+    Each line is an object with `question` (or `message`), an optional `id` (or
+    `request_id`, defaulting to the line number) and an optional `category`.
+    """
+    questions: list[BatchQuestion] = []
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            payload = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {lineno}: invalid JSON ({e.msg})") from e
+        if not isinstance(payload, dict):
+            raise ValueError(f"Line {lineno}: expected a JSON object")
+
+        text = str(payload.get("question") or payload.get("message") or "").strip()
+        if not text:
+            raise ValueError(f"Line {lineno}: missing 'question'")
+        category = payload.get("category") or None
+        if category and category not in PDF_CATEGORIES:
+            raise ValueError(f"Line {lineno}: invalid category '{category}'. Allowed: {PDF_CATEGORIES}")
+
+        questions.append({
+            "id": str(payload.get("id") or payload.get("request_id") or lineno),
+            "question": text,
+            "category": category,
+        })
+    return questions
+
+
+def group_by_category(questions: list[BatchQuestion]) -> dict[str | None, list[BatchQuestion]]:
+    groups: dict[str | None, list[BatchQuestion]] = {}
+    for q in questions:
+        groups.setdefault(q["category"], []).append(q)
+    return groups
+
+
+async def run_batch(
+    graph,
+    questions: list[BatchQuestion],
+    concurrency: int = BATCH_CONCURRENCY,
+    slot: Callable[[], AsyncContextManager] | None = None,
+    cache: RetrievalCache | None = None,
+) -> AsyncIterator[dict]:
+    """Answer every question with at most `concurrency` graph runs in flight, yielding results as they finish.
+
+    Questions are scheduled grouped by category, so runs in flight tend to search the same
+    documents. Their tool searches go through a RetrievalCache shared by the whole batch,
+    which serves repeated searches once and embeds concurrent misses in a single call.
+    `slot` optionally wraps each run in an extra context manager (the API uses it for
+    server-wide admission control). `graph` should be compiled without a checkpointer
+    (build_graph(checkpointer=False)) so answered questions are not kept in memory.
+    Pass `cache` to read its hit/miss counters afterwards; by default one sized to
+    `concurrency` is created.
+    """
+    concurrency = max(1, concurrency)
+    if cache is None:
+        cache = RetrievalCache(max_batch=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    groups = group_by_category(questions)
+
+    async def answer(q: BatchQuestion) -> dict:
+        # Each task runs in its own context copy, so this does not leak outside the batch.
+        batch_retrieval_cache.set(cache)
+        result = {"id": q["id"], "category": q["category"], "question": q["question"]}
+        async with semaphore:
+            try:
+                if slot:
+                    async with slot():
+                        state = await _invoke(graph, q)
+                else:
+                    state = await _invoke(graph, q)
+                result["agent"] = state.get("next_agent")
+                result["answer"] = content_to_text(state["messages"][-1].content)
+            except Exception as e:
+                result["error"] = str(e)
+        return result
+
+    tasks = [asyncio.create_task(answer(q)) for group in groups.values() for q in group]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _invoke(graph, q: BatchQuestion) -> dict:
+    """Run the graph in a worker thread and wait for it to finish even if cancelled.
+
+    The nodes make blocking Gemini calls that cannot be interrupted, so on cancellation
+    (e.g. the HTTP client disconnected) this keeps the caller's semaphore and admission
+    slot held until the thread is really done, however often it is cancelled, then re-raises.
+    """
+    text = q["question"]
+    if q["category"]:
+        text = f"[Category: {q['category']}] {text}"
+    run = asyncio.ensure_future(asyncio.to_thread(graph.invoke, {"messages": [HumanMessage(content=text)]}))
+    try:
+        return await asyncio.shield(run)
+    except asyncio.CancelledError:
+        # Cancellation can be redelivered (e.g. the response's cancel scope or shutdown),
+        # so keep absorbing it until the thread has finished.
+        while not run.done():
+            try:
+                await asyncio.wait({run})
+            except asyncio.CancelledError:
+                pass
+        raise
@@ -0,0 +1,232 @@
+import os
+import json
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+from fastapi import WebSocket
+
+# Server-wide limits on graph runs; every run fans out into several Gemini calls,
+# so these bound LLM quota usage and memory during traffic bursts.
+MAX_CONCURRENT_RUNS = int(os.getenv("POLICYPILOT_MAX_CONCURRENT_RUNS", "4"))
+MAX_RUNS_PER_USER = int(os.getenv("POLICYPILOT_MAX_RUNS_PER_USER", "1"))
+MAX_QUEUED_RUNS = int(os.getenv("POLICYPILOT_MAX_QUEUED_RUNS", "32"))
+
+# Token streaming: coalesce tokens into frames flushed by size or age, keep at most
+# STREAM_MAX_PENDING tokens buffered per connection, and drop clients that stall a send.
+FRAME_MAX_CHARS = int(os.getenv("POLICYPILOT_FRAME_MAX_CHARS", "256"))
+FRAME_INTERVAL = float(os.getenv("POLICYPILOT_FRAME_INTERVAL", "0.05"))
+STREAM_MAX_PENDING = int(os.getenv("POLICYPILOT_STREAM_MAX_PENDING", "512"))
+SEND_TIMEOUT = float(os.getenv("POLICYPILOT_SEND_TIMEOUT", "10"))
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue is at capacity."""
+
+
+class SlowClientError(Exception):
+    """Raised when a client does not keep up with the token stream."""
+
+
+# ── Admission control ──
+
+class _Ticket:
+    def __init__(self, user_id: str, per_user_limit: int, queue_limited: bool):
+        self.user_id = user_id
+        self.per_user_limit = per_user_limit
+        self.queue_limited = queue_limited
+        self.granted = asyncio.Event()
+        self.changed = asyncio.Event()
+
+
+class AdmissionController:
+    """Grants graph-run slots under a global and a per-user concurrency limit.
+
+    Waiters are served FIFO, except that a waiter whose user is already at the
+    per-user limit is skipped so it cannot block other users behind it.
+    All bookkeeping runs synchronously on the event loop, so no lock is needed.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_user: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self._waiters: deque[_Ticket] = deque()
+        self._active = 0
+        self._active_by_user: dict[str, int] = {}
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _dispatch(self) -> None:
+        for ticket in list(self._waiters):
+            if self._active >= self.max_concurrent:
+                break
+            if self._active_by_user.get(ticket.user_id, 0) >= ticket.per_user_limit:
+                continue
+            self._waiters.remove(ticket)
+            self._active += 1
+            self._active_by_user[ticket.user_id] = self._active_by_user.get(ticket.user_id, 0) + 1
+            ticket.granted.set()
+            ticket.changed.set()
+        for ticket in self._waiters:
+            ticket.changed.set()
+
+    def release(self, user_id: str) -> None:
+        """Return a slot obtained with acquire()."""
+        self._active -= 1
+        remaining = self._active_by_user.get(user_id, 1) - 1
+        if remaining:
+            self._active_by_user[user_id] = remaining
+        else:
+            self._active_by_user.pop(user_id, None)
+        self._dispatch()
+
+    async def acquire(
+        self,
+        user_id: str,
+        on_queued: Callable[[int], Awaitable[None]] | None = None,
+        per_user_limit: int | None = None,
+        queue_limited: bool = True,
+    ) -> None:
+        """Wait for a run slot, reporting the 1-based queue position via on_queued whenever it changes.
+
+        per_user_limit overrides max_per_user for this request, and queue_limited=False lets it
+        wait without counting toward max_queued (both used by batch jobs, which bound their own
+        waiters). Cancelling the wait drops the ticket from the queue. Pair with release().
+        """
+        if queue_limited and sum(t.queue_limited for t in self._waiters) >= self.max_queued:
+            raise QueueFullError("Server is busy. Please try again shortly.")
+
+        ticket = _Ticket(user_id, per_user_limit or self.max_per_user, queue_limited)
+        self._waiters.append(ticket)
+        self._dispatch()
+
+        try:
+            last_position = None
+            while not ticket.granted.is_set():
+                ticket.changed.clear()
+                position = self._waiters.index(ticket) + 1
+                if on_queued and position != last_position:
+                    await on_queued(position)
+                    last_position = position
+                if not ticket.granted.is_set():
+                    await ticket.changed.wait()
+        except BaseException:
+            if ticket.granted.is_set():
+                self.release(user_id)
+            else:
+                self._waiters.remove(ticket)
+                self._dispatch()
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: str,
+        on_queued: Callable[[int], Awaitable[None]] | None = None,
+        per_user_limit: int | None = None,
+        queue_limited: bool = True,
+    ):
+        """Context-manager form of acquire()/release()."""
+        await self.acquire(user_id, on_queued, per_user_limit, queue_limited)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+
+admission = AdmissionController(MAX_CONCURRENT_RUNS, MAX_RUNS_PER_USER, MAX_QUEUED_RUNS)
+
+
+# ── Coalesced token streaming with backpressure ──
+
+_EOF = object()
+
+
+class TokenStreamer:
+    """Sends tokens to a WebSocket as coalesced `token` frames from a background task.
+
+    push() blocks once STREAM_MAX_PENDING tokens are waiting, which pauses the graph
+    stream instead of buffering without limit. A send that takes longer than
+    SEND_TIMEOUT marks the client as slow and makes the next push() raise.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        max_chars: int = FRAME_MAX_CHARS,
+        interval: float = FRAME_INTERVAL,
+        max_pending: int = STREAM_MAX_PENDING,
+        send_timeout: float = SEND_TIMEOUT,
+    ):
+        self.ws = ws
+        self.max_chars = max_chars
+        self.interval = interval
+        self.send_timeout = send_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._error: BaseException | None = None
+        self._task = asyncio.create_task(self._run())
+
+    async def push(self, token: str) -> None:
+        if self._error:
+            raise SlowClientError("Client is not reading the stream fast enough.") from self._error
+        await self._queue.put(token)
+
+    async def close(self) -> None:
+        """Flush buffered tokens and stop the sender; raises if the client fell behind."""
+        await self._queue.put(_EOF)
+        await self._task
+        if self._error:
+            raise SlowClientError("Client is not reading the stream fast enough.") from self._error
+
+    async def abort(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _send(self, parts: list[str]) -> None:
+        if not parts or self._error:
+            return
+        try:
+            await asyncio.wait_for(
+                self.ws.send_text(json.dumps({"type": "token", "content": "".join(parts)})),
+                timeout=self.send_timeout,
+            )
+        except Exception as e:
+            self._error = e
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        parts: list[str] = []
+        size = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _EOF:
+                await self._send(parts)
+                return
+            if item is not None:
+                parts.append(item)
+                size += len(item)
+                if deadline is None:
+                    deadline = loop.time() + self.interval
+                if size < self.max_chars and loop.time() < deadline:
+                    continue
+
+            # Once the client has failed, keep draining so push() never blocks on a dead queue.
+            await self._send(parts)
+            parts, size, deadline = [], 0, None
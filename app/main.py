@@ -1,13 +1,53 @@
+import sys
+import json
 import uuid
+import asyncio
+import argparse
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 
 from app.agent.graph import build_graph
+from app.batch import BATCH_CONCURRENCY, load_questions, run_batch
+from app.tools.policy_tools import RetrievalCache
+
+
+async def run_batch_file(questions: list, output: str | None, concurrency: int) -> None:
+    print(f"Answering {len(questions)} questions (concurrency {concurrency})...", file=sys.stderr)
+
+    graph = build_graph(checkpointer=False)
+    cache = RetrievalCache(max_batch=concurrency)
+    out = open(output, "w") if output else sys.stdout
+    try:
+        async for result in run_batch(graph, questions, concurrency=concurrency, cache=cache):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if output:
+            out.close()
+        print(
+            f"Batch retrievals: {cache.hits} cached, {cache.misses} searched in {cache.flushes} embedding calls.",
+            file=sys.stderr,
+        )
 
 
 def main():
     load_dotenv()
 
+    parser = argparse.ArgumentParser(description="PolicyPilot - Policy Assistant")
+    parser.add_argument("--batch", metavar="JSONL", help="answer every question in a JSONL file instead of starting the chat")
+    parser.add_argument("-o", "--output", help="write batch results to this JSONL file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY, help="max graph runs in flight for --batch")
+    args = parser.parse_args()
+
+    if args.batch:
+        try:
+            with open(args.batch) as f:
+                questions = load_questions(f)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        asyncio.run(run_batch_file(questions, args.output, args.concurrency))
+        return
+
     print("=" * 60)
     print("  PolicyPilot - Policy Assistant")
     print("=" * 60)
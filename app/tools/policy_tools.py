@@ -1,8 +1,115 @@
+import os
+import threading
+from concurrent.futures import Future
+from contextvars import ContextVar
+
+from langchain_core.documents import Document
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
+from langchain_chroma import Chroma
 from app.data.ingest import get_vectorstore, PDF_CATEGORIES
 
 
+# ── Shared retrieval cache for batch runs ──
+# Batch jobs set batch_retrieval_cache so the searches the agents run are deduplicated across
+# questions and embedded together with searches from other graph runs in flight.
+
+BATCH_SEARCH_WINDOW = float(os.getenv("POLICYPILOT_BATCH_SEARCH_WINDOW", "0.02"))
+
+
+class RetrievalCache:
+    """Thread-safe memo of similarity searches keyed by (normalized query, category).
+
+    Each entry keeps the largest k fetched so far; smaller requests are served from its prefix.
+    Concurrent lookups of the same key wait on the in-flight search instead of repeating it.
+    Misses from parallel runs are collected for up to `window` seconds (or until `max_batch`
+    are pending) and flushed with a single embed_documents call plus searches by vector.
+    """
+
+    def __init__(self, max_batch: int = 1, window: float = BATCH_SEARCH_WINDOW):
+        self.max_batch = max(1, max_batch)
+        self.window = window
+        self._lock = threading.Lock()
+        self._batch_full = threading.Condition(self._lock)
+        self._entries: dict[tuple[str, str | None], tuple[int, Future]] = {}
+        self._pending: list[tuple[tuple[str, str | None], str, str | None, int, Future]] = []
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+
+    @staticmethod
+    def _key(query: str, category: str | None) -> tuple[str, str | None]:
+        return " ".join(query.lower().split()), category
+
+    def _fail(self, key: tuple[str, str | None], future: Future, error: Exception) -> None:
+        with self._lock:
+            if self._entries.get(key, (0, None))[1] is future:
+                del self._entries[key]
+        future.set_exception(error)
+
+    def _fill(self, key: tuple[str, str | None], future: Future, search) -> None:
+        try:
+            future.set_result(search())
+        except Exception as e:
+            self._fail(key, future, e)
+
+    def search(self, vectorstore: Chroma, query: str, category: str | None, k: int) -> list[Document]:
+        key = self._key(query, category)
+        batch = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] >= k:
+                self.hits += 1
+                future = entry[1]
+            else:
+                self.misses += 1
+                future = Future()
+                self._entries[key] = (k, future)
+                self._pending.append((key, query, category, k, future))
+                if len(self._pending) >= self.max_batch:
+                    self._batch_full.notify()
+                if len(self._pending) == 1:
+                    # First miss of a new batch leads it: wait for more misses, then flush them all.
+                    self._batch_full.wait_for(lambda: len(self._pending) >= self.max_batch, timeout=self.window)
+                    batch, self._pending = self._pending, []
+                    self.flushes += 1
+        if batch:
+            self._flush(vectorstore, batch)
+        return future.result()[:k]
+
+    def _flush(self, vectorstore: Chroma, batch: list) -> None:
+        try:
+            vectors = vectorstore.embeddings.embed_documents([query for _, query, _, _, _ in batch])
+        except Exception as e:
+            for key, _, _, _, future in batch:
+                self._fail(key, future, e)
+            return
+        for (key, _, category, k, future), vector in zip(batch, vectors):
+            self._fill(key, future, lambda v=vector, c=category, k=k: vectorstore.similarity_search_by_vector(v, **_search_kwargs(c, k)))
+
+
+batch_retrieval_cache: ContextVar[RetrievalCache | None] = ContextVar("batch_retrieval_cache", default=None)
+
+
+def _search_kwargs(category: str | None, k: int) -> dict:
+    search_kwargs = {"k": k}
+    if category:
+        search_kwargs["filter"] = {"category": category}
+    return search_kwargs
+
+
+def _similarity_search(vectorstore: Chroma, query: str, category: str | None, k: int) -> list[Document]:
+    return vectorstore.similarity_search(query, **_search_kwargs(category, k))
+
+
+def _search(query: str, category: str | None, k: int) -> list[Document]:
+    vectorstore = get_vectorstore()
+    cache = batch_retrieval_cache.get()
+    if cache is None:
+        return _similarity_search(vectorstore, query, category, k)
+    return cache.search(vectorstore, query, category, k)
+
+
 class PolicySearchInput(BaseModel):
     query: str = Field(description="The policy-related question to search for.")
     category: str | None = Field(
@@ -18,13 +125,7 @@ def search_policy(query: str, category: str | None = None) -> str:
     Can optionally filter by category (health_insurance, car_insurance, term_insurance, etc.).
     Use this for detailed policy questions about coverage, exclusions,
     claims process, waiting periods, etc."""
-    vectorstore = get_vectorstore()
-
-    search_kwargs = {"k": 5}
-    if category:
-        search_kwargs["filter"] = {"category": category}
-
-    docs = vectorstore.similarity_search(query, **search_kwargs)
+    docs = _search(query, category, k=5)
 
     if not docs:
         return "No relevant information found in the uploaded policy documents."
@@ -58,15 +159,10 @@ def compare_policies(query: str, category: str | None = None) -> str:
     Retrieves relevant chunks grouped by source document for side-by-side comparison.
     Optionally filter by category. If results span multiple categories, a warning is returned
     asking the user to specify the insurance type."""
-    vectorstore = get_vectorstore()
-
-    search_kwargs = {"k": 8}
-    if category:
-        if category not in PDF_CATEGORIES:
-            return f"Invalid category '{category}'. Allowed categories: {PDF_CATEGORIES}"
-        search_kwargs["filter"] = {"category": category}
+    if category and category not in PDF_CATEGORIES:
+        return f"Invalid category '{category}'. Allowed categories: {PDF_CATEGORIES}"
 
-    docs = vectorstore.similarity_search(query, **search_kwargs)
+    docs = _search(query, category, k=8)
 
     if not docs:
         return "No relevant information found in the uploaded policy documents."
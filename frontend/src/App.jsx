@@ -29,6 +29,7 @@ function Chat() {
   const [messages, setMessages] = useState([])
   const [input, setInput] = useState('')
   const [streaming, setStreaming] = useState(false)
+  const [queuePos, setQueuePos] = useState(null)
   const wsRef = useRef(null)
   const bottomRef = useRef(null)
   const inputRef = useRef(null)
@@ -44,12 +45,18 @@ function Chat() {
       ws.onopen = () => { if (!cancelled) wsRef.current = ws }
       ws.onclose = () => {
         if (wsRef.current === ws) wsRef.current = null
+        // The server may close on purpose (e.g. slow client) or restart; a pending answer won't arrive.
+        setQueuePos(null)
+        setStreaming(false)
         if (!cancelled) reconnectTimer = setTimeout(connect, 1000)
       }
       ws.onerror = () => ws.close()
       ws.onmessage = (e) => {
         const data = JSON.parse(e.data)
-        if (data.type === 'start') {
+        if (data.type === 'queued') {
+          setQueuePos(data.position)
+        } else if (data.type === 'start') {
+          setQueuePos(null)
           streamBuf.current = ''
           setStreaming(true)
           setMessages((prev) => [...prev, { role: 'assistant', content: '' }])
@@ -64,6 +71,7 @@ function Chat() {
           setStreaming(false)
           setTimeout(() => inputRef.current?.focus(), 0)
         } else if (data.type === 'error') {
+          setQueuePos(null)
           setStreaming(false)
           setMessages((prev) => [...prev, { role: 'error', content: data.content }])
         }
@@ -78,7 +86,7 @@ function Chat() {
   const send = (e) => {
     e.preventDefault()
     const text = input.trim()
-    if (!text || streaming) return
+    if (!text || streaming || queuePos !== null) return
     setMessages((prev) => [...prev, { role: 'user', content: text }])
     wsRef.current?.send(JSON.stringify({ message: text }))
     setInput('')
@@ -97,6 +105,9 @@ function Chat() {
             <div className="msg-body">{m.content}{streaming && i === messages.length - 1 && m.role === 'assistant' && <span className="cursor" />}</div>
           </div>
         ))}
+        {queuePos !== null && (
+          <p className="empty">Waiting for a free slot — position {queuePos} in queue…</p>
+        )}
         <div ref={bottomRef} />
       </div>
       <form onSubmit={send} className="chat-input">
@@ -0,0 +1,4 @@
+import os
+
+# app.agent.nodes builds the Gemini client at import time; tests never call it.
+os.environ.setdefault("GOOGLE_API_KEY", "test")
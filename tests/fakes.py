@@ -0,0 +1,20 @@
+import asyncio
+
+
+class FakeWebSocket:
+    """Minimal stand-in for fastapi.WebSocket: scripted receive(), recorded send_text()."""
+
+    def __init__(self, messages=(), send_delay: float = 0):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        for message in messages:
+            self.incoming.put_nowait(message)
+        self.sent: list[str] = []
+        self.send_delay = send_delay
+
+    async def receive(self) -> dict:
+        return await self.incoming.get()
+
+    async def send_text(self, text: str) -> None:
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.sent.append(text)
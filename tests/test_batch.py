@@ -0,0 +1,215 @@
+import time
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.batch import _invoke, load_questions, run_batch
+from app.tools.policy_tools import RetrievalCache, batch_retrieval_cache, _search
+
+
+class FakeEmbeddings:
+    def __init__(self, delay: float = 0):
+        self.calls: list[list[str]] = []
+        self.delay = delay
+        self.fail = False
+
+    def embed_documents(self, texts):
+        if self.fail:
+            raise RuntimeError("ollama down")
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return [[text] for text in texts]
+
+
+class FakeVectorstore:
+    def __init__(self, delay: float = 0):
+        self.embeddings = FakeEmbeddings(delay)
+        self.searches: list[tuple[str, int, dict | None]] = []
+        self._lock = threading.Lock()
+
+    def similarity_search_by_vector(self, vector, k, filter=None):
+        with self._lock:
+            self.searches.append((vector[0], k, filter))
+        return [f"{vector[0]}#{i}" for i in range(k)]
+
+
+def _search_in_threads(cache, vectorstore, calls):
+    results = [None] * len(calls)
+
+    def worker(i, query, category, k):
+        results[i] = cache.search(vectorstore, query, category, k)
+
+    threads = [threading.Thread(target=worker, args=(i, *call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# ── RetrievalCache ──
+
+def test_cache_dedups_normalized_queries():
+    vectorstore = FakeVectorstore()
+    cache = RetrievalCache(window=0)
+    first = cache.search(vectorstore, "Waiting  period", "health_insurance", 5)
+    second = cache.search(vectorstore, "waiting period ", "health_insurance", 5)
+    assert first == second
+    assert len(vectorstore.searches) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_keys_on_category():
+    vectorstore = FakeVectorstore()
+    cache = RetrievalCache(window=0)
+    cache.search(vectorstore, "claims", "health_insurance", 5)
+    cache.search(vectorstore, "claims", None, 5)
+    assert [s[2] for s in vectorstore.searches] == [{"category": "health_insurance"}, None]
+
+
+def test_cache_serves_smaller_k_from_larger_entry():
+    vectorstore = FakeVectorstore()
+    cache = RetrievalCache(window=0)
+    assert len(cache.search(vectorstore, "claims", None, 8)) == 8
+    assert cache.search(vectorstore, "claims", None, 5) == [f"claims#{i}" for i in range(5)]
+    assert len(vectorstore.searches) == 1
+
+    assert len(cache.search(vectorstore, "claims", None, 10)) == 10
+    assert [s[1] for s in vectorstore.searches] == [8, 10]
+
+
+def test_cache_batches_concurrent_misses_into_one_embedding_call():
+    vectorstore = FakeVectorstore()
+    cache = RetrievalCache(max_batch=10, window=0.2)
+    calls = [("a", None, 5), ("b", "car_insurance", 8), ("c", None, 5)]
+    results = _search_in_threads(cache, vectorstore, calls)
+    assert len(vectorstore.embeddings.calls) == 1
+    assert sorted(vectorstore.embeddings.calls[0]) == ["a", "b", "c"]
+    assert [len(r) for r in results] == [5, 8, 5]
+    assert cache.flushes == 1
+
+
+def test_cache_flushes_early_when_batch_is_full():
+    vectorstore = FakeVectorstore()
+    cache = RetrievalCache(max_batch=2, window=5)
+    start = time.monotonic()
+    _search_in_threads(cache, vectorstore, [("a", None, 5), ("b", None, 5)])
+    assert time.monotonic() - start < 1
+    assert len(vectorstore.embeddings.calls) == 1
+
+
+def test_cache_does_not_keep_failed_searches():
+    vectorstore = FakeVectorstore()
+    cache = RetrievalCache(window=0)
+    vectorstore.embeddings.fail = True
+    with pytest.raises(RuntimeError):
+        cache.search(vectorstore, "claims", None, 5)
+
+    vectorstore.embeddings.fail = False
+    assert cache.search(vectorstore, "claims", None, 5)[0] == "claims#0"
+
+
+def test_tools_use_cache_from_context(monkeypatch):
+    vectorstore = FakeVectorstore()
+    monkeypatch.setattr("app.tools.policy_tools.get_vectorstore", lambda: vectorstore)
+    cache = RetrievalCache(window=0)
+    token = batch_retrieval_cache.set(cache)
+    try:
+        _search("claims", None, 5)
+        _search("claims", None, 5)
+    finally:
+        batch_retrieval_cache.reset(token)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+# ── load_questions ──
+
+def test_load_questions_defaults_and_aliases():
+    questions = load_questions([
+        '{"id": "q1", "question": "Waiting period?", "category": "health_insurance"}',
+        "",
+        '{"request_id": "r2", "message": " Claims? "}',
+        '{"question": "Exclusions?"}',
+    ])
+    assert questions == [
+        {"id": "q1", "question": "Waiting period?", "category": "health_insurance"},
+        {"id": "r2", "question": "Claims?", "category": None},
+        {"id": "4", "question": "Exclusions?", "category": None},
+    ]
+
+
+@pytest.mark.parametrize(
+    "line, message",
+    [
+        ("{not json", "Line 1: invalid JSON"),
+        ('["a list"]', "Line 1: expected a JSON object"),
+        ('{"id": "x"}', "Line 1: missing 'question'"),
+        ('{"question": "q", "category": "pet_insurance"}', "Line 1: invalid category 'pet_insurance'"),
+    ],
+)
+def test_load_questions_errors(line, message):
+    with pytest.raises(ValueError, match=message):
+        load_questions([line])
+
+
+# ── run_batch ──
+
+class FakeGraph:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, state):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            text = state["messages"][0].content
+            if "boom" in text:
+                raise RuntimeError("boom")
+            return {"messages": [AIMessage(content=f"answer: {text}")], "next_agent": "policy_expert"}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_run_batch_bounds_parallelism_and_reports_errors():
+    questions = load_questions([
+        '{"id": "1", "question": "a", "category": "health_insurance"}',
+        '{"id": "2", "question": "boom"}',
+        '{"id": "3", "question": "b", "category": "health_insurance"}',
+        '{"id": "4", "question": "c"}',
+    ])
+    graph = FakeGraph(delay=0.05)
+
+    async def collect():
+        return [result async for result in run_batch(graph, questions, concurrency=2)]
+
+    results = {r["id"]: r for r in asyncio.run(collect())}
+    assert graph.peak <= 2
+    assert results["1"]["answer"] == "answer: [Category: health_insurance] a"
+    assert results["2"]["error"] == "boom"
+    assert results["4"]["agent"] == "policy_expert"
+
+
+def test_invoke_waits_for_thread_across_repeated_cancels():
+    graph = FakeGraph(delay=0.3)
+
+    async def scenario():
+        task = asyncio.create_task(_invoke(graph, {"id": "1", "question": "q", "category": None}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert graph.active == 0
+
+    asyncio.run(scenario())
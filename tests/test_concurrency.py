@@ -0,0 +1,218 @@
+import json
+import asyncio
+from collections import deque
+
+import pytest
+
+from app.concurrency import AdmissionController, QueueFullError, SlowClientError, TokenStreamer
+from tests.fakes import FakeWebSocket
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# ── AdmissionController ──
+
+def test_per_user_limit_skips_to_other_users():
+    async def scenario():
+        ac = AdmissionController(max_concurrent=2, max_per_user=1, max_queued=8)
+        await ac.acquire("a")
+        queued_a = asyncio.create_task(ac.acquire("a"))
+        await asyncio.sleep(0)
+        await ac.acquire("b")  # not blocked behind a's second request
+        assert ac.active == 2 and ac.queued == 1
+
+        ac.release("b")
+        await asyncio.sleep(0)
+        assert not queued_a.done()  # a is still at its limit
+        ac.release("a")
+        await queued_a
+        assert ac.active == 1 and ac.queued == 0
+
+    run(scenario())
+
+
+def test_queue_position_callbacks():
+    async def scenario():
+        ac = AdmissionController(max_concurrent=1, max_per_user=1, max_queued=8)
+        await ac.acquire("holder")
+        positions: dict[str, list[int]] = {"a": [], "b": []}
+
+        def recorder(user):
+            async def on_queued(position):
+                positions[user].append(position)
+            return on_queued
+
+        first = asyncio.create_task(ac.acquire("a", on_queued=recorder("a")))
+        second = asyncio.create_task(ac.acquire("b", on_queued=recorder("b")))
+        await asyncio.sleep(0)
+        assert positions == {"a": [1], "b": [2]}
+
+        ac.release("holder")
+        await first
+        await asyncio.sleep(0)
+        assert positions["b"] == [2, 1]
+
+        ac.release("a")
+        await second
+
+    run(scenario())
+
+
+def test_cancel_while_queued_drops_ticket():
+    async def scenario():
+        ac = AdmissionController(max_concurrent=1, max_per_user=1, max_queued=8)
+        await ac.acquire("holder")
+        waiter = asyncio.create_task(ac.acquire("u"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert ac.queued == 0
+
+        ac.release("holder")
+        assert ac.active == 0
+
+    run(scenario())
+
+
+def test_cancel_after_grant_releases_slot():
+    async def scenario():
+        ac = AdmissionController(max_concurrent=1, max_per_user=1, max_queued=8)
+        await ac.acquire("holder")
+        waiter = asyncio.create_task(ac.acquire("u"))
+        await asyncio.sleep(0)
+        ac.release("holder")  # grants u, but the waiter has not resumed yet
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert ac.active == 0 and ac.queued == 0
+
+    run(scenario())
+
+
+def test_queue_full_only_counts_limited_tickets():
+    async def scenario():
+        ac = AdmissionController(max_concurrent=1, max_per_user=1, max_queued=1)
+        await ac.acquire("holder")
+        batch = asyncio.create_task(ac.acquire("batch", queue_limited=False))
+        chat = asyncio.create_task(ac.acquire("chat"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(QueueFullError):
+            await ac.acquire("other")
+        more_batch = asyncio.create_task(ac.acquire("batch", per_user_limit=2, queue_limited=False))
+        await asyncio.sleep(0)
+        assert ac.queued == 3
+
+        for task in (batch, chat, more_batch):
+            task.cancel()
+        await asyncio.gather(batch, chat, more_batch, return_exceptions=True)
+        assert ac.queued == 0
+
+    run(scenario())
+
+
+# ── TokenStreamer ──
+
+def _frames(ws: FakeWebSocket) -> list[str]:
+    return [json.loads(text)["content"] for text in ws.sent]
+
+
+def test_streamer_coalesces_by_size():
+    async def scenario():
+        ws = FakeWebSocket()
+        streamer = TokenStreamer(ws, max_chars=6, interval=10)
+        for token in ["ab", "cd", "ef", "gh"]:
+            await streamer.push(token)
+        await streamer.close()
+        return _frames(ws)
+
+    assert run(scenario()) == ["abcdef", "gh"]
+
+
+def test_streamer_flushes_after_interval():
+    async def scenario():
+        ws = FakeWebSocket()
+        streamer = TokenStreamer(ws, max_chars=1000, interval=0.02)
+        await streamer.push("a")
+        await streamer.push("b")
+        await asyncio.sleep(0.1)
+        flushed = _frames(ws)
+        await streamer.push("c")
+        await streamer.close()
+        return flushed, _frames(ws)
+
+    flushed, frames = run(scenario())
+    assert flushed == ["ab"]
+    assert frames == ["ab", "c"]
+
+
+def test_streamer_raises_for_slow_client():
+    async def scenario():
+        ws = FakeWebSocket(send_delay=1)
+        streamer = TokenStreamer(ws, max_chars=1, max_pending=2, send_timeout=0.02)
+        with pytest.raises(SlowClientError):
+            for _ in range(100):
+                await streamer.push("t")
+        await streamer.abort()
+
+    run(scenario())
+
+
+# ── Chat admission while watching for disconnects ──
+
+@pytest.fixture
+def api(monkeypatch):
+    import app.api
+    controller = AdmissionController(max_concurrent=1, max_per_user=1, max_queued=8)
+    monkeypatch.setattr(app.api, "admission", controller)
+    return app.api, controller
+
+
+def test_disconnect_in_same_pass_as_grant_releases_slot(api):
+    module, controller = api
+
+    async def scenario():
+        ws = FakeWebSocket([{"type": "websocket.disconnect"}])
+        assert await module._acquire_while_connected(ws, "u", None, deque()) is False
+
+    run(scenario())
+    assert controller.active == 0
+
+
+def test_cancelled_handler_does_not_leak_later_grant(api):
+    module, controller = api
+
+    async def scenario():
+        await controller.acquire("holder")
+        handler = asyncio.create_task(module._acquire_while_connected(FakeWebSocket(), "u", None, deque()))
+        await asyncio.sleep(0.01)
+        handler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await handler
+        controller.release("holder")
+        await asyncio.sleep(0.01)
+
+    run(scenario())
+    assert controller.active == 0 and controller.queued == 0
+
+
+def test_messages_while_queued_are_capped(api):
+    module, controller = api
+
+    async def scenario():
+        await controller.acquire("holder")
+        ws = FakeWebSocket([{"type": "websocket.receive", "text": str(i)} for i in range(4)])
+        inbox: deque[str] = deque()
+        handler = asyncio.create_task(module._acquire_while_connected(ws, "u", None, inbox))
+        await asyncio.sleep(0.01)
+        controller.release("holder")
+        assert await handler is True
+        controller.release("u")
+        return inbox, ws
+
+    inbox, ws = run(scenario())
+    assert list(inbox) == ["0"]
+    assert [json.loads(text)["type"] for text in ws.sent] == ["error"] * 3